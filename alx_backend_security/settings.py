@@ -64,6 +64,11 @@ CELERY_BEAT_SCHEDULE = {
         "schedule": crontab(minute=0, hour="*"),  # every hour at minute 0
         "options": {"queue": "anomaly"},
     },
+    "rollup-request-logs": {
+        "task": "ip_tracking.tasks.rollup_request_logs",
+        "schedule": crontab(minute="*/5"),  # keeps the activity API's aggregates <= 5 min stale
+        "options": {"queue": "anomaly"},
+    },
 }
 
 ROOT_URLCONF = 'alx_backend_security.urls'
@@ -0,0 +1,160 @@
+# ip_tracking/breaker.py
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# tuning parameters (easy to change)
+WINDOW_SIZE = 50            # most recent calls considered for the trip decision
+MIN_CALLS = 10              # don't trip on a handful of samples
+FAILURE_RATE_THRESHOLD = 0.5
+SLOW_CALL_SECONDS = 0.25
+SLOW_RATE_THRESHOLD = 0.5
+OPEN_SECONDS = 10           # how long to short-circuit before a half-open probe
+
+
+class CircuitBreaker:
+    """
+    Latency- and error-aware circuit breaker.
+
+    - closed: calls run; outcomes go into a sliding window. The breaker trips when
+      the window's failure rate or slow-call rate crosses its threshold.
+    - open: calls are short-circuited straight to their fallback for OPEN_SECONDS.
+    - half_open: a single probe call is let through; success closes the breaker,
+      failure (or a slow call) re-opens it.
+
+    State changes are logged and counted; metrics() returns a snapshot.
+    """
+
+    def __init__(self, name, window_size=WINDOW_SIZE, min_calls=MIN_CALLS,
+                 failure_rate=FAILURE_RATE_THRESHOLD, slow_call_seconds=SLOW_CALL_SECONDS,
+                 slow_rate=SLOW_RATE_THRESHOLD, open_seconds=OPEN_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=window_size)  # (failed, slow) per call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._counters = {"calls": 0, "failures": 0, "slow_calls": 0, "short_circuited": 0}
+        self._transitions = {}
+        self._last_transition_at = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def call(self, func, fallback, count_slow=True):
+        """
+        Run func() through the breaker. Returns fallback() instead when the breaker
+        is open or func raises; exceptions from func are logged, not propagated.
+
+        count_slow=False records only the outcome, not the latency, for calls that
+        are expected to be slow (e.g. bulk loads).
+        """
+        is_probe = self._acquire()
+        if is_probe is None:
+            return fallback()
+
+        started = time.monotonic()
+        failed = True
+        try:
+            result = func()
+            failed = False
+        except Exception as exc:
+            logger.error("Circuit %s: call failed: %s", self.name, exc)
+        finally:
+            # also runs for BaseExceptions (worker timeouts, SystemExit) that propagate,
+            # so a half-open probe can never stay in flight forever
+            self._record(failed=failed, elapsed=time.monotonic() - started, is_probe=is_probe, count_slow=count_slow)
+        return fallback() if failed else result
+
+    def metrics(self):
+        with self._lock:
+            failed = sum(1 for f, _ in self._window if f)
+            slow = sum(1 for _, s in self._window if s)
+            return {
+                "name": self.name,
+                "state": self._state,
+                "window_calls": len(self._window),
+                "window_failures": failed,
+                "window_slow_calls": slow,
+                "last_transition_at": self._last_transition_at,
+                "transitions": dict(self._transitions),
+                **self._counters,
+            }
+
+    def _acquire(self):
+        """Returns None to short-circuit, True for a half-open probe, False for a normal call."""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self._counters["short_circuited"] += 1
+                    return None
+                self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self._counters["short_circuited"] += 1
+                    return None
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def _record(self, failed, elapsed, is_probe, count_slow=True):
+        slow = count_slow and elapsed >= self.slow_call_seconds
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["failures"] += failed
+            self._counters["slow_calls"] += slow
+
+            if is_probe:
+                self._probe_in_flight = False
+                if failed or slow:
+                    self._open()
+                else:
+                    self._window.clear()
+                    self._transition(CLOSED)
+                return
+
+            self._window.append((failed, slow))
+            if self._state != CLOSED or len(self._window) < self.min_calls:
+                return
+            total = len(self._window)
+            failure_rate = sum(1 for f, _ in self._window if f) / total
+            slow_rate = sum(1 for _, s in self._window if s) / total
+            if failure_rate >= self.failure_rate or slow_rate >= self.slow_rate:
+                logger.warning(
+                    "Circuit %s tripping: failure_rate=%.2f slow_rate=%.2f over %d calls",
+                    self.name, failure_rate, slow_rate, total,
+                )
+                self._open()
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._transition(OPEN)
+
+    def _transition(self, new_state):
+        # caller holds self._lock
+        if new_state == self._state:
+            return
+        key = f"{self._state}->{new_state}"
+        self._transitions[key] = self._transitions.get(key, 0) + 1
+        self._last_transition_at = time.time()
+        logger.warning("Circuit %s: %s", self.name, key)
+        self._state = new_state
+
+
+# shared by everything in this process that talks to the database on the request path
+db_breaker = CircuitBreaker("db")
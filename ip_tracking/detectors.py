@@ -0,0 +1,267 @@
+# ip_tracking/detectors.py
+"""
+Behavioral anomaly detectors over a RequestLog window.
+
+The window's (ip, timestamp, path) columns are pulled in one streaming query,
+factorized into integer codes and turned into per-IP features with grouped
+NumPy operations (bincount / unique / argsort) — no per-row Python loops in
+the feature math.
+
+Features per IP:
+- inter-arrival coefficient of variation (std / mean of gaps) and the derived
+  burstiness B = (cv - 1) / (cv + 1): ~-1 for clockwork bots, ~0 for Poisson, ~1 for bursts
+- distinct-path ratio (distinct paths / requests); like entropy and rare paths it
+  ignores ASSET_PATH_PREFIXES, which every page load pulls in
+- path entropy in bits
+- rare paths / rare-path ratio: distinct paths no other IP hit in the window, and
+  the share of requests going to them.
+  RequestLog has no status code, so this stands in for 404 probing: scanners
+  walk paths that real clients never request.
+"""
+import logging
+import operator
+from functools import reduce
+
+import numpy as np
+from django.db import connection
+from django.db.models import Q
+
+from .models import RequestLog, RequestPath
+
+logger = logging.getLogger(__name__)
+
+# tuning parameters (easy to change)
+STREAM_CHUNK_SIZE = 50_000
+MIN_REQUESTS_FOR_TIMING = 20        # gaps from fewer requests are too noisy
+REGULAR_BURSTINESS_MAX = -0.8       # B <= -0.8  <=>  cv <= ~0.11
+SCAN_MIN_DISTINCT_PATHS = 100      # page paths per window; browsers stay well below this
+SCAN_MIN_DISTINCT_RATIO = 0.9
+SCAN_MIN_ENTROPY_BITS = 6.0        # ~log2(SCAN_MIN_DISTINCT_PATHS) for a flat spread
+# assets every page load pulls in; left out of the path-diversity features
+ASSET_PATH_PREFIXES = ["/static/", "/media/", "/favicon.ico", "/robots.txt"]
+PROBE_MIN_RARE_PATHS = 10          # distinct rare paths, so one private endpoint isn't probing
+PROBE_MIN_RARE_RATIO = 0.5
+
+
+# epoch-seconds expression per backend, so timestamps leave the DB as floats
+# and never become Python datetimes
+_EPOCH_SQL = {
+    "sqlite": "(julianday({col}) - 2440587.5) * 86400.0",
+    "postgresql": "EXTRACT(EPOCH FROM {col})",
+    "mysql": "UNIX_TIMESTAMP({col})",
+}
+# ip stays a Python str (object): fixed-width unicode fields make both the copy and
+# the factorization several times slower
+_ROW_DTYPE = np.dtype([("ip", object), ("ts", np.float64), ("path", np.int64)])
+
+
+def load_window(since, until=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream (ip_address, timestamp, path) for the window and return factorized arrays:
+    (ip_labels, ip_codes, timestamps, path_labels, path_codes).
+
+    Uses a raw cursor with fetchmany: the DB returns epoch seconds and the integer
+    path id, and each chunk goes straight into NumPy through a structured fromiter,
+    without model rows or datetimes. IPs are factorized through one dict shared by
+    all chunks (each new IP is keyed by the row it first appears on). The scan is
+    bounded by primary key (the smallest id inside the window, found on the
+    timestamp index), so it reads the table in id order instead of seeking row by
+    row from the index; rows therefore arrive in insertion order, which
+    compute_features re-sorts by time where needed.
+    *_codes index into the matching *_labels array; path_labels are RequestPath ids.
+    """
+    ops = connection.ops
+    table = ops.quote_name(RequestLog._meta.db_table)
+    col = ops.quote_name("timestamp")
+    where = f"{col} >= %s"
+    params = [ops.adapt_datetimefield_value(since)]
+    if until is not None:
+        where += f" AND {col} < %s"
+        params.append(ops.adapt_datetimefield_value(until))
+
+    first_row = {}  # ip -> global index of its first row; insertion order == ascending index
+    row_chunks, ts_chunks, path_chunks = [], [], []
+    n_rows = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(id) FROM {table} WHERE {where}", params)
+        first_id = cursor.fetchone()[0]
+        if first_id is not None:
+            epoch = _EPOCH_SQL[connection.vendor].format(col=col)
+            cursor.execute(
+                f"SELECT ip_address, {epoch}, path_id FROM {table} WHERE id >= %s AND {where}",
+                [first_id, *params],
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                chunk = np.fromiter(rows, dtype=_ROW_DTYPE, count=len(rows))
+                row_chunks.append(np.fromiter(
+                    map(first_row.setdefault, chunk["ip"].tolist(), range(n_rows, n_rows + len(rows))),
+                    dtype=np.int64, count=len(rows),
+                ))
+                ts_chunks.append(chunk["ts"])
+                path_chunks.append(chunk["path"])
+                n_rows += len(rows)
+
+    if not n_rows:
+        empty = np.empty(0, dtype=np.int64)
+        return np.empty(0, dtype=object), empty, np.empty(0), empty, empty
+
+    # first-row keys -> dense codes, then renumber so labels come out sorted
+    first_rows = np.fromiter(first_row.values(), dtype=np.int64, count=len(first_row))
+    labels = np.fromiter(first_row.keys(), dtype=object, count=len(first_row))
+    order = np.argsort(labels)
+    code_of_row = np.empty(n_rows, dtype=np.int64)  # only first_rows entries are read
+    code_of_row[first_rows[order]] = np.arange(len(order))
+    ip_codes = code_of_row[np.concatenate(row_chunks)]
+    path_labels, path_codes = np.unique(np.concatenate(path_chunks), return_inverse=True)
+    return labels[order], ip_codes, np.concatenate(ts_chunks), path_labels, path_codes
+
+
+def compute_features(ip_codes, timestamps, path_codes, n_ips, n_paths, ignored_paths=None):
+    """
+    Per-IP feature arrays (each of length n_ips) computed with grouped vector ops.
+
+    ignored_paths is an optional boolean mask over path codes (e.g. static assets);
+    those requests count for timing but not for the path-diversity features.
+    """
+    ip_codes = np.asarray(ip_codes, dtype=np.int64)
+    path_codes = np.asarray(path_codes, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+
+    requests = np.bincount(ip_codes, minlength=n_ips)
+
+    # group rows by IP, time-ordered within each group. load_window returns rows in
+    # insertion order, which is almost time order, so the stable time sort (when needed
+    # at all) is cheap; the row index is then the time rank and a single unstable sort
+    # on (ip, rank) groups by IP. lexsort is several times slower.
+    n_rows = len(ip_codes)
+    if n_rows > 1 and (np.diff(timestamps) < 0).any():
+        time_order = np.argsort(timestamps, kind="stable")
+    else:
+        time_order = np.arange(n_rows)
+    order = time_order[np.argsort(ip_codes[time_order] * n_rows + np.arange(n_rows))]
+    ip_sorted = ip_codes[order]
+    ts_sorted = timestamps[order]
+
+    group_end = np.ones(len(ip_sorted), dtype=bool)
+    group_end[:-1] = ip_sorted[1:] != ip_sorted[:-1]
+    last_seen = np.full(n_ips, np.nan)
+    last_seen[ip_sorted[group_end]] = ts_sorted[group_end]
+
+    # inter-arrival gaps, only between consecutive requests of the same IP
+    same_ip = ~group_end[:-1]
+    gaps = np.diff(ts_sorted)[same_ip]
+    gap_ip = ip_sorted[1:][same_ip]
+    n_gaps = np.bincount(gap_ip, minlength=n_ips)
+    gap_sum = np.bincount(gap_ip, weights=gaps, minlength=n_ips)
+    gap_sq_sum = np.bincount(gap_ip, weights=gaps * gaps, minlength=n_ips)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_gap = gap_sum / n_gaps
+        std_gap = np.sqrt(np.maximum(gap_sq_sum / n_gaps - mean_gap * mean_gap, 0.0))
+        cv = std_gap / mean_gap
+    burstiness = (cv - 1.0) / (cv + 1.0)
+
+    # (ip, path) pair counts -> distinct paths and entropy, over non-ignored paths only
+    page_rows = slice(None) if ignored_paths is None else ~np.asarray(ignored_paths, dtype=bool)[path_codes]
+    page_ips = ip_codes[page_rows]
+    page_requests = np.bincount(page_ips, minlength=n_ips)
+    pairs = page_ips * n_paths + path_codes[page_rows]
+    pair_keys, pair_counts = np.unique(pairs, return_counts=True)
+    pair_ip = pair_keys // n_paths
+    pair_path = pair_keys % n_paths
+    distinct_paths = np.bincount(pair_ip, minlength=n_ips)
+    p = pair_counts / page_requests[pair_ip]
+    path_entropy = np.bincount(pair_ip, weights=-p * np.log2(p), minlength=n_ips)
+
+    # paths requested by exactly one IP in the window
+    ips_per_path = np.bincount(pair_path, minlength=n_paths)
+    rare_pair = ips_per_path[pair_path] == 1
+    rare_paths = np.bincount(pair_ip, weights=rare_pair, minlength=n_ips)
+    rare_hits = np.bincount(pair_ip, weights=pair_counts * rare_pair, minlength=n_ips)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distinct_ratio = distinct_paths / page_requests
+        rare_ratio = rare_hits / page_requests
+
+    return {
+        "requests": requests,
+        "last_seen": last_seen,
+        "interarrival_cv": cv,
+        "burstiness": burstiness,
+        "distinct_paths": distinct_paths,
+        "distinct_ratio": distinct_ratio,
+        "path_entropy": path_entropy,
+        "rare_paths": rare_paths,
+        "rare_ratio": rare_ratio,
+    }
+
+
+def flag_features(features):
+    """
+    Apply the thresholds to feature arrays. Returns {reason: boolean mask over IPs}.
+    """
+    requests = features["requests"]
+    with np.errstate(invalid="ignore"):
+        return {
+            "regular_interarrival": (
+                (requests >= MIN_REQUESTS_FOR_TIMING)
+                & (features["burstiness"] <= REGULAR_BURSTINESS_MAX)
+            ),
+            "path_scanning": (
+                (features["distinct_paths"] >= SCAN_MIN_DISTINCT_PATHS)
+                & (features["distinct_ratio"] >= SCAN_MIN_DISTINCT_RATIO)
+                & (features["path_entropy"] >= SCAN_MIN_ENTROPY_BITS)
+            ),
+            "path_probing": (
+                (features["rare_paths"] >= PROBE_MIN_RARE_PATHS)
+                & (features["rare_ratio"] >= PROBE_MIN_RARE_RATIO)
+            ),
+        }
+
+
+def _details(features, i):
+    return (
+        f"requests={int(features['requests'][i])} "
+        f"interarrival_cv={features['interarrival_cv'][i]:.3f} "
+        f"burstiness={features['burstiness'][i]:.3f} "
+        f"distinct_paths={int(features['distinct_paths'][i])} "
+        f"distinct_ratio={features['distinct_ratio'][i]:.3f} "
+        f"path_entropy={features['path_entropy'][i]:.3f} "
+        f"rare_paths={int(features['rare_paths'][i])} "
+        f"rare_ratio={features['rare_ratio'][i]:.3f}"
+    )
+
+
+def detect_behavioral_anomalies(since, until=None):
+    """
+    Run all behavioral detectors over the window.
+
+    Returns a list of dicts with ip_address, reason, details and last_seen (epoch seconds),
+    one per flagged (IP, reason) pair.
+    """
+    ip_labels, ip_codes, timestamps, path_labels, path_codes = load_window(since, until)
+    if not len(ip_codes):
+        return []
+
+    asset_ids = RequestPath.objects.filter(
+        reduce(operator.or_, (Q(path__startswith=prefix) for prefix in ASSET_PATH_PREFIXES)),
+    ).values_list("id", flat=True)
+    ignored_paths = np.isin(path_labels, list(asset_ids))
+
+    features = compute_features(
+        ip_codes, timestamps, path_codes, len(ip_labels), len(path_labels), ignored_paths=ignored_paths,
+    )
+    logger.info("Behavioral features computed for %d IPs over %d requests", len(ip_labels), len(ip_codes))
+
+    flagged = []
+    for reason, mask in flag_features(features).items():
+        for i in np.flatnonzero(mask):
+            flagged.append({
+                "ip_address": ip_labels[i],
+                "reason": reason,
+                "details": _details(features, i),
+                "last_seen": float(features["last_seen"][i]),
+            })
+    return flagged
@@ -0,0 +1,33 @@
+# ip_tracking/management/commands/rollup_requests.py
+from django.core.management.base import BaseCommand, CommandError
+
+from ip_tracking.models import RollupWatermark
+from ip_tracking.tasks import ROLLUP_REFRESH_HOURS, ROLLUP_WATERMARK, rollup_request_logs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the hourly request rollup now. Besides the hours touched by rows added since "
+        "the last run, recounts the last --hours buckets; --full recounts all history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=int, default=ROLLUP_REFRESH_HOURS,
+            help=f"Trailing hourly buckets to recount (default: {ROLLUP_REFRESH_HOURS})",
+        )
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Reset the rollup watermark first, so every hour with RequestLog rows is recounted",
+        )
+
+    def handle(self, *args, **options):
+        if options["hours"] < 1:
+            raise CommandError("--hours must be positive")
+        if options["full"]:
+            RollupWatermark.objects.filter(name=ROLLUP_WATERMARK).update(last_request_id=0)
+
+        result = rollup_request_logs(hours=options["hours"])
+        if result["status"] != "ok":
+            raise CommandError("Rollup failed; see the log for details")
+        self.stdout.write(self.style.SUCCESS(f"Recounted {result['buckets']} hourly buckets"))
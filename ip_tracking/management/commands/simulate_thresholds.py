@@ -0,0 +1,202 @@
+# ip_tracking/management/commands/simulate_thresholds.py
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import product
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ip_tracking.detectors import load_window
+from ip_tracking.models import RequestPath
+from ip_tracking.paths import path_digest
+from ip_tracking.tasks import REQUEST_THRESHOLD_PER_HOUR, SENSITIVE_PATHS
+
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+# what detect_suspicious_ips runs in production; always evaluated and used as the baseline
+PRODUCTION_RULES = "production"
+PRODUCTION_WINDOW_SECONDS = 3600
+PRODUCTION_POLICY = (REQUEST_THRESHOLD_PER_HOUR, PRODUCTION_WINDOW_SECONDS, PRODUCTION_RULES)
+
+
+def _parse_window(raw):
+    raw = raw.strip().lower()
+    unit, value = (raw[-1], raw[:-1]) if raw[-1:] in WINDOW_UNITS else ("s", raw)
+    try:
+        seconds = int(value) * WINDOW_UNITS[unit]
+    except ValueError:
+        raise CommandError(f"Invalid window {raw!r}; use e.g. 30m, 1h, 3600")
+    if seconds <= 0:
+        raise CommandError(f"Window must be positive: {raw!r}")
+    return seconds
+
+
+def _parse_rule_set(raw):
+    name, sep, paths = raw.partition("=")
+    if not sep or not name.strip():
+        raise CommandError(f"Invalid path rule set {raw!r}; use name=/path1,/path2")
+    return name.strip(), [p.strip() for p in paths.split(",") if p.strip()]
+
+
+def _parse_timestamp(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.fromisoformat(value)
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed.timestamp()
+
+
+def load_trace(path):
+    """
+    Read an exported JSONL trace (one {"ip_address", "timestamp", "path"} object per line;
+    timestamp as ISO-8601 or epoch seconds) into the same arrays load_window returns.
+    """
+    ips, stamps, paths = [], [], []
+    with open(path, encoding="utf-8") as fh:
+        for lineno, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                ips.append(row.get("ip_address") or row["ip"])
+                stamps.append(_parse_timestamp(row["timestamp"]))
+                paths.append(row["path"])
+            except (KeyError, TypeError, ValueError) as exc:
+                raise CommandError(f"{path}:{lineno}: bad trace row ({exc})")
+
+    ip_labels, ip_codes = np.unique(np.array(ips, dtype=object), return_inverse=True)
+    path_labels, path_codes = np.unique(np.array(paths, dtype=object), return_inverse=True)
+    return ip_labels, ip_codes, np.array(stamps, dtype=np.float64), path_labels, path_codes
+
+
+def max_window_counts(ip_codes, timestamps, n_ips, window_seconds):
+    """
+    Highest request count each IP reached in any tumbling window of window_seconds
+    (windows aligned to the epoch, like the hourly detection run).
+    """
+    buckets = (timestamps // window_seconds).astype(np.int64)
+    buckets -= buckets.min()
+    n_buckets = int(buckets.max()) + 1
+    keys, counts = np.unique(ip_codes.astype(np.int64) * n_buckets + buckets, return_counts=True)
+    key_ip = keys // n_buckets
+    starts = np.flatnonzero(np.r_[True, key_ip[1:] != key_ip[:-1]])
+    max_counts = np.zeros(n_ips, dtype=np.int64)
+    max_counts[key_ip[starts]] = np.maximum.reduceat(counts, starts)
+    return max_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay historical RequestLog data (or an exported JSONL trace) once and report how many "
+        "IPs each detection policy in a grid of thresholds x windows x path rule sets would flag."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=24 * 7, help="History to replay from RequestLog (default: 168)")
+        parser.add_argument("--trace", type=str, help="Replay this JSONL trace instead of RequestLog")
+        parser.add_argument(
+            "--thresholds", type=str, default=f"50,{REQUEST_THRESHOLD_PER_HOUR},200",
+            help="Comma-separated request-count thresholds; an IP is flagged above the value",
+        )
+        parser.add_argument(
+            "--windows", type=str, default="15m,1h,6h",
+            help="Comma-separated window sizes, e.g. 15m,1h,6h (seconds when no unit)",
+        )
+        parser.add_argument(
+            "--path-rules", action="append", default=[], metavar="NAME=/p1,/p2",
+            help=(
+                "Named sensitive-path rule set; repeatable. The production set "
+                f"({PRODUCTION_RULES!r} = tasks.SENSITIVE_PATHS) is always evaluated too"
+            ),
+        )
+        parser.add_argument("--json", action="store_true", help="Emit JSON including pairwise overlaps")
+
+    def handle(self, *args, **options):
+        try:
+            thresholds = sorted({int(t) for t in options["thresholds"].split(",") if t.strip()})
+        except ValueError:
+            raise CommandError("--thresholds must be comma-separated integers")
+        windows = sorted({_parse_window(w) for w in options["windows"].split(",") if w.strip()})
+        rule_sets = {PRODUCTION_RULES: list(SENSITIVE_PATHS)}
+        for name, paths in (_parse_rule_set(r) for r in options["path_rules"]):
+            if name == PRODUCTION_RULES:
+                raise CommandError(f"Rule set name {PRODUCTION_RULES!r} is reserved for tasks.SENSITIVE_PATHS")
+            rule_sets[name] = paths
+        if not thresholds or not windows:
+            raise CommandError("Need at least one threshold and one window")
+
+        # single pass over the data
+        if options["trace"]:
+            ip_labels, ip_codes, timestamps, path_labels, path_codes = load_trace(options["trace"])
+            rule_labels = {name: paths for name, paths in rule_sets.items()}
+        else:
+            since = timezone.now() - timedelta(hours=options["hours"])
+            ip_labels, ip_codes, timestamps, path_labels, path_codes = load_window(since)
+            rule_labels = {
+                name: list(RequestPath.objects.filter(digest__in=[path_digest(p) for p in paths]).values_list("id", flat=True))
+                for name, paths in rule_sets.items()
+            }
+        n_ips = len(ip_labels)
+        if not n_ips:
+            raise CommandError("No requests to replay")
+
+        # per-IP aggregates shared by every policy
+        rate_max = {
+            w: max_window_counts(ip_codes, timestamps, n_ips, w)
+            for w in {*windows, PRODUCTION_WINDOW_SECONDS}
+        }
+        path_flagged = {}
+        for name, labels in rule_labels.items():
+            row_mask = np.isin(path_labels, labels)[path_codes]
+            path_flagged[name] = np.bincount(ip_codes[row_mask], minlength=n_ips) > 0
+
+        policies = list(product(thresholds, windows, rule_sets))
+        if PRODUCTION_POLICY not in policies:
+            policies.append(PRODUCTION_POLICY)
+        baseline = policies.index(PRODUCTION_POLICY)
+        flags = np.stack([(rate_max[w] > t) | path_flagged[r] for t, w, r in policies])
+        flagged_counts = flags.sum(axis=1)
+        overlap = flags.astype(np.int64) @ flags.T.astype(np.int64)
+
+        results = []
+        for i, (threshold, window, rules) in enumerate(policies):
+            union = flagged_counts[i] + flagged_counts[baseline] - overlap[i, baseline]
+            results.append({
+                "threshold": threshold,
+                "window_seconds": window,
+                "path_rules": rules,
+                "flagged": int(flagged_counts[i]),
+                "rate_flagged": int((rate_max[window] > threshold).sum()),
+                "path_flagged": int(path_flagged[rules].sum()),
+                "shared_with_baseline": int(overlap[i, baseline]),
+                "jaccard_vs_baseline": float(overlap[i, baseline] / union) if union else 1.0,
+            })
+
+        if options["json"]:
+            self.stdout.write(json.dumps({
+                "requests": int(len(ip_codes)),
+                "ips": n_ips,
+                "baseline": baseline,
+                "policies": results,
+                "pairwise_overlap": overlap.tolist(),
+            }, indent=2))
+            return
+
+        self.stdout.write(f"Replayed {len(ip_codes)} requests from {n_ips} IPs; {len(policies)} policies")
+        b = results[baseline]
+        self.stdout.write(
+            f"Baseline (production): threshold>{b['threshold']} window={b['window_seconds']}s "
+            f"rules={b['path_rules']}"
+        )
+        self.stdout.write(
+            f"{'threshold':>9} {'window_s':>8} {'rules':<12} {'flagged':>7} {'rate':>6} {'path':>6} "
+            f"{'shared':>6} {'jaccard':>7}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['threshold']:>9} {row['window_seconds']:>8} {row['path_rules']:<12} {row['flagged']:>7} "
+                f"{row['rate_flagged']:>6} {row['path_flagged']:>6} {row['shared_with_baseline']:>6} "
+                f"{row['jaccard_vs_baseline']:>7.3f}"
+            )
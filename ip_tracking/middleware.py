@@ -1,11 +1,62 @@
 # ip_tracking/middleware.py
 import logging
+import threading
+import time
+from collections import deque
+
 from django.core.cache import cache
+from django.db import InterfaceError, OperationalError, transaction
 from django.http import HttpResponseForbidden
+from django.utils import timezone
+
+from .breaker import CLOSED, db_breaker
+from .paths import intern_path, intern_paths
 
 logger = logging.getLogger(__name__)
 
 GEO_CACHE_TTL = 60 * 60 * 24  # 24 hours
+BLOCKLIST_SNAPSHOT_TTL = 60   # seconds between full BlockedIP reloads
+LOG_BUFFER_SIZE = 10000       # (ip, path, timestamp, attempts) log entries held while the DB circuit is open
+LOG_FLUSH_BATCH = 500         # buffered rows written per request once the circuit closes
+LOG_FLUSH_MAX_ATTEMPTS = 5    # failed flushes before a buffered row is given up on
+
+# DB unreachable / overloaded: worth buffering and retrying. Any other error is a
+# problem with the row itself (e.g. DataError for an over-long IP) and would fail again.
+RETRYABLE_DB_ERRORS = (OperationalError, InterfaceError)
+
+# Process-wide degraded-mode state shared by all middleware instances/threads.
+_blocklist_snapshot = frozenset()
+_blocklist_loaded_at = None
+_log_buffer = deque(maxlen=LOG_BUFFER_SIZE)
+_log_buffer_dropped = 0
+_log_rows_rejected = 0
+_state_lock = threading.Lock()
+_blocklist_refresh_lock = threading.Lock()  # held by the one request reloading the snapshot
+
+
+def degraded_mode_metrics():
+    """
+    Circuit breaker and fallback-state metrics for the middleware's DB operations.
+    """
+    return {
+        "breaker": db_breaker.metrics(),
+        "blocklist_snapshot_size": len(_blocklist_snapshot),
+        "blocklist_snapshot_age": (
+            time.monotonic() - _blocklist_loaded_at if _blocklist_loaded_at is not None else None
+        ),
+        "log_buffer_size": len(_log_buffer),
+        "log_buffer_dropped": _log_buffer_dropped,
+        "log_rows_rejected": _log_rows_rejected,
+    }
+
+
+def _reject_log_rows(count, exc):
+    """Drop log rows the DB refused for reasons other than an outage."""
+    global _log_rows_rejected
+
+    with _state_lock:
+        _log_rows_rejected += count
+    logger.error("Dropping %d request log row(s) rejected by the DB: %s", count, exc)
 
 
 class IPLoggingMiddleware:
@@ -16,6 +67,12 @@ class IPLoggingMiddleware:
 
     The blacklist check is done before saving RequestLog so blocked requests are
     rejected immediately.
+
+    All DB work goes through the shared db_breaker. While it is open the blacklist
+    decision comes from the last good in-memory snapshot of BlockedIP and log rows
+    are held in a bounded buffer, flushed in batches once the breaker closes again.
+    Only connection/operational errors buffer a row; rows the DB rejects outright
+    are logged and dropped so they cannot block the buffer.
     """
 
     def __init__(self, get_response):
@@ -25,27 +82,145 @@ class IPLoggingMiddleware:
         ip = self._get_client_ip(request)
         path = getattr(request, "path", "")
 
-        # Check blacklist first; do a local import to avoid import-time cycles
-        try:
-            from .models import BlockedIP
-            if BlockedIP.objects.filter(ip_address=ip).exists():
-                # Optionally log the blocked attempt for audit
-                logger.warning("Blocked request from blacklisted IP %s to %s", ip, path)
-                return HttpResponseForbidden("Your IP has been blocked.")
-        except Exception as exc:
-            # If blacklist check fails (DB down etc.), log error but continue processing.
-            logger.error("Error checking BlockedIP for IP %s: %s", ip, exc)
+        if self._is_blocked(ip):
+            # Optionally log the blocked attempt for audit
+            logger.warning("Blocked request from blacklisted IP %s to %s", ip, path)
+            return HttpResponseForbidden("Your IP has been blocked.")
 
         # Not blocked -> attempt to log the request (non-fatal)
-        try:
-            from .models import RequestLog
-            RequestLog.objects.create(ip_address=ip, path=path)
-        except Exception as exc:
-            logger.exception("Failed to log request for IP %s path %s: %s", ip, path, exc)
+        self._log_request(ip, path)
 
         response = self.get_response(request)
         return response
 
+    def _is_blocked(self, ip):
+        """
+        Check the blacklist in the DB, falling back to the in-memory snapshot
+        when the breaker is open or the query fails.
+        """
+        if self._refresh_blocklist_snapshot():
+            # just loaded the whole table; no need for a second query
+            return ip in _blocklist_snapshot
+
+        def query():
+            # local import to avoid import-time cycles
+            from .models import BlockedIP
+            return BlockedIP.objects.filter(ip_address=ip).exists()
+
+        return db_breaker.call(query, fallback=lambda: ip in _blocklist_snapshot)
+
+    def _refresh_blocklist_snapshot(self):
+        """
+        Reload the BlockedIP snapshot when it is older than BLOCKLIST_SNAPSHOT_TTL.
+        Returns True if this call loaded a fresh snapshot.
+        """
+        global _blocklist_snapshot, _blocklist_loaded_at
+
+        loaded_at = _blocklist_loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < BLOCKLIST_SNAPSHOT_TTL:
+            return False
+        if db_breaker.state != CLOSED:
+            return False
+        if not _blocklist_refresh_lock.acquire(blocking=False):
+            # another request is already reloading; keep serving the current snapshot
+            return False
+        try:
+            loaded_at = _blocklist_loaded_at
+            if loaded_at is not None and time.monotonic() - loaded_at < BLOCKLIST_SNAPSHOT_TTL:
+                return False  # reloaded while we were checking
+
+            def load():
+                from .models import BlockedIP
+                return frozenset(BlockedIP.objects.values_list("ip_address", flat=True))
+
+            # a full-table load is expected to be slower than a point lookup, so only
+            # its errors (not its latency) count towards tripping the breaker
+            snapshot = db_breaker.call(load, fallback=lambda: None, count_slow=False)
+            if snapshot is None:
+                return False
+            _blocklist_snapshot = snapshot
+            _blocklist_loaded_at = time.monotonic()
+            return True
+        finally:
+            _blocklist_refresh_lock.release()
+
+    def _log_request(self, ip, path):
+        global _log_buffer_dropped
+
+        entry = (ip, path, timezone.now(), 0)
+
+        def write():
+            from .models import RequestLog
+            try:
+                RequestLog.objects.create(ip_address=ip, path_id=intern_path(path), timestamp=entry[2])
+            except RETRYABLE_DB_ERRORS:
+                raise
+            except Exception as exc:
+                _reject_log_rows(1, exc)
+            return True
+
+        if db_breaker.call(write, fallback=lambda: False):
+            self._flush_log_buffer()
+            return
+
+        with _state_lock:
+            if len(_log_buffer) == _log_buffer.maxlen:
+                _log_buffer_dropped += 1
+            _log_buffer.append(entry)
+
+    def _flush_log_buffer(self):
+        global _log_buffer_dropped
+
+        if not _log_buffer:
+            return
+        with _state_lock:
+            batch = [_log_buffer.popleft() for _ in range(min(LOG_FLUSH_BATCH, len(_log_buffer)))]
+        attempted = False
+        done = 0  # leading rows of batch already stored or rejected
+
+        def write():
+            nonlocal attempted, done
+            from .models import RequestLog
+            attempted = True
+            try:
+                path_ids = intern_paths(path for _, path, _, _ in batch)
+                RequestLog.objects.bulk_create([
+                    RequestLog(ip_address=ip, path_id=path_ids[path], timestamp=ts)
+                    for ip, path, ts, _ in batch
+                ])
+                done = len(batch)
+                return True
+            except RETRYABLE_DB_ERRORS:
+                raise
+            except Exception as exc:
+                logger.warning("Flushing %d buffered request logs failed (%s); retrying row by row", len(batch), exc)
+
+            # isolate the rows the DB refuses; an outage part-way still re-queues the rest
+            for ip, path, ts, _ in batch:
+                try:
+                    with transaction.atomic():
+                        RequestLog.objects.create(ip_address=ip, path_id=intern_path(path), timestamp=ts)
+                except RETRYABLE_DB_ERRORS:
+                    raise
+                except Exception as exc:
+                    _reject_log_rows(1, exc)
+                done += 1
+            return True
+
+        if db_breaker.call(write, fallback=lambda: False):
+            logger.info("Flushed %d buffered request logs", len(batch))
+            return
+
+        retry = [(ip, path, ts, attempts + attempted) for ip, path, ts, attempts in batch[done:]]
+        expired = sum(1 for entry in retry if entry[3] >= LOG_FLUSH_MAX_ATTEMPTS)
+        if expired:
+            logger.warning("Giving up on %d buffered request logs after %d failed flushes", expired, LOG_FLUSH_MAX_ATTEMPTS)
+            retry = [entry for entry in retry if entry[3] < LOG_FLUSH_MAX_ATTEMPTS]
+        # put the rest back in front, oldest first; overflow drops from the new end
+        with _state_lock:
+            _log_buffer_dropped += expired + max(0, len(_log_buffer) + len(retry) - _log_buffer.maxlen)
+            _log_buffer.extendleft(reversed(retry))
+
     def _get_client_ip(self, request):
         """
         Determine the client's IP address.
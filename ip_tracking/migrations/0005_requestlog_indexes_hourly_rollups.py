@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0004_suspiciousip'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='requestlog',
+            index=models.Index(fields=['ip_address', 'timestamp', 'id'], name='requestlog_ip_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestlog',
+            index=models.Index(fields=['timestamp'], name='requestlog_ts_idx'),
+        ),
+        migrations.CreateModel(
+            name='IPHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('ip_address', models.CharField(max_length=45)),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('last_seen', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'IP Hourly Rollup',
+                'verbose_name_plural': 'IP Hourly Rollups',
+                'ordering': ('-bucket',),
+                'indexes': [models.Index(fields=['ip_address', 'bucket'], name='iprollup_ip_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'ip_address'), name='uniq_iprollup_bucket_ip')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PathHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('path', models.CharField(max_length=2048)),
+                ('requests', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Path Hourly Rollup',
+                'verbose_name_plural': 'Path Hourly Rollups',
+                'ordering': ('-bucket',),
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'path'), name='uniq_pathrollup_bucket_path')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0006_requestlog_timestamp_default'),
+    ]
+
+    operations = [
+        # Dropped before interning (and given a default) so that unapplying
+        # 0009 can re-add the string columns before 0008 restores their values.
+        migrations.RemoveConstraint(
+            model_name='pathhourlyrollup',
+            name='uniq_pathrollup_bucket_path',
+        ),
+        migrations.AlterField(
+            model_name='requestlog',
+            name='path',
+            field=models.CharField(default='', max_length=2048),
+        ),
+        migrations.AlterField(
+            model_name='pathhourlyrollup',
+            name='path',
+            field=models.CharField(default='', max_length=2048),
+        ),
+        migrations.CreateModel(
+            name='RequestPath',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=40, unique=True)),
+                ('path', models.TextField()),
+            ],
+            options={
+                'verbose_name': 'Request Path',
+                'verbose_name_plural': 'Request Paths',
+            },
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='path_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='requests', to='ip_tracking.requestpath'),
+        ),
+        migrations.AddField(
+            model_name='pathhourlyrollup',
+            name='path_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='ip_tracking.requestpath'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:00
+
+import hashlib
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+TEMP_INDEX = 'ip_tracking_requestpath_path_tmp'
+
+
+def _digest(path):
+    return hashlib.sha1(path.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def intern_existing_paths(apps, schema_editor):
+    """
+    Create a RequestPath for every distinct path string, then point existing
+    RequestLog / PathHourlyRollup rows at it with one set-based UPDATE per table.
+    The correlated lookup is served by a temporary index on RequestPath.path.
+    """
+    RequestPath = apps.get_model('ip_tracking', 'RequestPath')
+    RequestLog = apps.get_model('ip_tracking', 'RequestLog')
+    PathHourlyRollup = apps.get_model('ip_tracking', 'PathHourlyRollup')
+    qn = schema_editor.quote_name
+
+    paths = set(RequestLog.objects.order_by().values_list('path', flat=True).distinct())
+    paths.update(PathHourlyRollup.objects.order_by().values_list('path', flat=True).distinct())
+    RequestPath.objects.bulk_create(
+        (RequestPath(digest=_digest(path), path=path) for path in paths),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    path_table = qn(RequestPath._meta.db_table)
+    schema_editor.execute(f"CREATE INDEX {qn(TEMP_INDEX)} ON {path_table} ({qn('path')})")
+    for model in (RequestLog, PathHourlyRollup):
+        table = qn(model._meta.db_table)
+        schema_editor.execute(
+            f"UPDATE {table} SET {qn('path_ref_id')} = ("
+            f"SELECT p.{qn('id')} FROM {path_table} p WHERE p.{qn('path')} = {table}.{qn('path')})"
+        )
+    schema_editor.execute(schema_editor.sql_delete_index % {'table': path_table, 'name': qn(TEMP_INDEX)})
+
+
+def restore_path_strings(apps, schema_editor):
+    RequestPath = apps.get_model('ip_tracking', 'RequestPath')
+    RequestLog = apps.get_model('ip_tracking', 'RequestLog')
+    PathHourlyRollup = apps.get_model('ip_tracking', 'PathHourlyRollup')
+    qn = schema_editor.quote_name
+
+    path_table = qn(RequestPath._meta.db_table)
+    for model in (RequestLog, PathHourlyRollup):
+        table = qn(model._meta.db_table)
+        schema_editor.execute(
+            f"UPDATE {table} SET {qn('path')} = ("
+            f"SELECT p.{qn('path')} FROM {path_table} p WHERE p.{qn('id')} = {table}.{qn('path_ref_id')})"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0007_requestpath'),
+    ]
+
+    operations = [
+        migrations.RunPython(intern_existing_paths, restore_path_strings),
+    ]
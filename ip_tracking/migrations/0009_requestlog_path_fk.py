@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0008_intern_request_paths'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='requestlog',
+            name='path',
+        ),
+        migrations.RemoveField(
+            model_name='pathhourlyrollup',
+            name='path',
+        ),
+        migrations.RenameField(
+            model_name='requestlog',
+            old_name='path_ref',
+            new_name='path',
+        ),
+        migrations.RenameField(
+            model_name='pathhourlyrollup',
+            old_name='path_ref',
+            new_name='path',
+        ),
+        migrations.AlterField(
+            model_name='requestlog',
+            name='path',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='requests', to='ip_tracking.requestpath'),
+        ),
+        migrations.AlterField(
+            model_name='pathhourlyrollup',
+            name='path',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='ip_tracking.requestpath'),
+        ),
+        migrations.AddConstraint(
+            model_name='pathhourlyrollup',
+            constraint=models.UniqueConstraint(fields=('bucket', 'path'), name='uniq_pathrollup_bucket_path'),
+        ),
+    ]
@@ -1,25 +1,51 @@
 # from django.db import models
+from django.utils import timezone
 # Create your models here.
 from django.db import models
 
 
+class RequestPath(models.Model):
+    """
+    Interned request paths. Real traffic repeats a small set of paths, so
+    RequestLog stores an integer reference here instead of the string.
+    Lookups go through digest (sha1 of the path) so the unique index stays small;
+    see paths.intern_path for the cached request-path lookup.
+    """
+    digest = models.CharField(max_length=40, unique=True)
+    path = models.TextField()
+
+    class Meta:
+        verbose_name = "Request Path"
+        verbose_name_plural = "Request Paths"
+
+    def __str__(self):
+        return self.path
+
+
 class RequestLog(models.Model):
     """
     Stores a simple audit of incoming requests:
     - ip_address: client's IP (supports IPv4 and IPv6)
-    - path: request path
+    - path: request path (interned in RequestPath)
     - timestamp: when the request was received
     """
     ip_address = models.CharField(max_length=45)  # enough for IPv6
-    path = models.CharField(max_length=2048)
+    path = models.ForeignKey(RequestPath, on_delete=models.PROTECT, related_name="requests")
     country = models.CharField(max_length=100, blank=True)  # ISO country name or code
     city = models.CharField(max_length=100, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default rather than auto_now_add so rows buffered during a DB outage keep their request time
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ("-timestamp",)
         verbose_name = "Request Log"
         verbose_name_plural = "Request Logs"
+        indexes = [
+            # per-IP timelines are keyset-paginated on (timestamp, id) within one IP
+            models.Index(fields=["ip_address", "timestamp", "id"], name="requestlog_ip_ts_id_idx"),
+            # window scans (rollups, detection) filter on timestamp only
+            models.Index(fields=["timestamp"], name="requestlog_ts_idx"),
+        ]
 
     def __str__(self):
         return f"{self.ip_address} @ {self.timestamp.isoformat()} -> {self.path} ({self.city}, {self.country})"
@@ -66,3 +92,68 @@ class SuspiciousIP(models.Model):
 
     def __str__(self):
         return f"{self.ip_address} ({self.reason})"
+
+
+class IPHourlyRollup(models.Model):
+    """
+    Pre-aggregated request counts per IP per hour.
+    Refreshed by the rollup_request_logs task so top-IP and per-IP summaries
+    never have to scan RequestLog.
+    """
+    bucket = models.DateTimeField()  # start of the hour
+    ip_address = models.CharField(max_length=45)
+    requests = models.PositiveIntegerField(default=0)
+    last_seen = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-bucket",)
+        verbose_name = "IP Hourly Rollup"
+        verbose_name_plural = "IP Hourly Rollups"
+        constraints = [
+            models.UniqueConstraint(fields=["bucket", "ip_address"], name="uniq_iprollup_bucket_ip"),
+        ]
+        indexes = [
+            models.Index(fields=["ip_address", "bucket"], name="iprollup_ip_bucket_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.ip_address} @ {self.bucket.isoformat()}: {self.requests}"
+
+
+class PathHourlyRollup(models.Model):
+    """
+    Pre-aggregated request counts per path per hour, refreshed alongside IPHourlyRollup.
+    """
+    bucket = models.DateTimeField()  # start of the hour
+    path = models.ForeignKey(RequestPath, on_delete=models.CASCADE, related_name="hourly_rollups")
+    requests = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ("-bucket",)
+        verbose_name = "Path Hourly Rollup"
+        verbose_name_plural = "Path Hourly Rollups"
+        constraints = [
+            models.UniqueConstraint(fields=["bucket", "path"], name="uniq_pathrollup_bucket_path"),
+        ]
+
+    def __str__(self):
+        return f"{self.path} @ {self.bucket.isoformat()}: {self.requests}"
+
+
+class RollupWatermark(models.Model):
+    """
+    Highest RequestLog id already folded into the hourly rollups.
+    Rows above it arrived since the last rollup run whatever their timestamp
+    (late buffer flushes, beat downtime, history from before the rollups existed),
+    so the task recounts exactly the hours those rows landed in.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_request_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Rollup Watermark"
+        verbose_name_plural = "Rollup Watermarks"
+
+    def __str__(self):
+        return f"{self.name}: {self.last_request_id}"
@@ -0,0 +1,82 @@
+# ip_tracking/paths.py
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.db import transaction
+
+# tuning parameters (easy to change)
+PATH_CACHE_SIZE = 10000  # path -> RequestPath id entries kept per process (LRU)
+
+_path_ids = OrderedDict()
+_lock = threading.Lock()
+
+
+def path_digest(path):
+    """Stable key for RequestPath.digest."""
+    return hashlib.sha1(path.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def _remember(path, path_id):
+    with _lock:
+        _path_ids[path] = path_id
+        _path_ids.move_to_end(path)
+        if len(_path_ids) > PATH_CACHE_SIZE:
+            _path_ids.popitem(last=False)
+
+
+def _remember_on_commit(mapping):
+    # An id created inside a transaction that later rolls back must never reach
+    # the cache, or every later log row for that path would carry a dangling FK.
+    def remember():
+        for path, path_id in mapping.items():
+            _remember(path, path_id)
+    transaction.on_commit(remember)
+
+
+def intern_path(path):
+    """
+    Return the RequestPath id for path, creating the row if needed.
+    Known paths are served from a bounded in-process LRU without touching the DB;
+    new ids enter the cache only once their transaction commits.
+    """
+    with _lock:
+        path_id = _path_ids.get(path)
+        if path_id is not None:
+            _path_ids.move_to_end(path)
+            return path_id
+
+    from .models import RequestPath
+    obj, _ = RequestPath.objects.get_or_create(digest=path_digest(path), defaults={"path": path})
+    _remember_on_commit({path: obj.pk})
+    return obj.pk
+
+
+def intern_paths(paths):
+    """
+    Bulk variant of intern_path: returns {path: id}, resolving the paths missing
+    from the cache with one insert (conflicts ignored) and one select.
+    """
+    result = {}
+    missing = set()
+    with _lock:
+        for path in set(paths):
+            path_id = _path_ids.get(path)
+            if path_id is None:
+                missing.add(path)
+            else:
+                result[path] = path_id
+    if not missing:
+        return result
+
+    from .models import RequestPath
+    digests = {path_digest(path): path for path in missing}
+    RequestPath.objects.bulk_create(
+        [RequestPath(digest=digest, path=path) for digest, path in digests.items()],
+        ignore_conflicts=True,
+    )
+    rows = RequestPath.objects.filter(digest__in=list(digests)).values_list("digest", "id")
+    resolved = {digests[digest]: path_id for digest, path_id in rows}
+    _remember_on_commit(resolved)
+    result.update(resolved)
+    return result
@@ -1,18 +1,25 @@
 # ip_tracking/tasks.py
 import logging
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 from celery import shared_task
 from django.utils import timezone
 from django.db.models import Count, Max
+from django.db.models.functions import TruncHour
 
-from .models import RequestLog, SuspiciousIP
+from .detectors import detect_behavioral_anomalies
+from .models import IPHourlyRollup, PathHourlyRollup, RequestLog, RequestPath, RollupWatermark, SuspiciousIP
+from .paths import path_digest
 
 logger = logging.getLogger(__name__)
 
 # tuning parameters (easy to change)
 REQUEST_THRESHOLD_PER_HOUR = 100
 SENSITIVE_PATHS = ["/admin", "/login", "/wp-login.php", "/staff/login"]
+ROLLUP_REFRESH_HOURS = 2  # current hour plus the previous one, recounted on every run
+ROLLUP_BATCH_SIZE = 1000
+ROLLUP_MAX_SPAN_HOURS = 24  # consecutive buckets recounted per aggregation query
+ROLLUP_WATERMARK = "request_rollups"
 
 
 @shared_task(bind=True)
@@ -22,7 +29,8 @@ def detect_suspicious_ips(self):
 
     1) Flags IPs with > REQUEST_THRESHOLD_PER_HOUR requests in the last hour.
     2) Flags IPs that accessed sensitive paths in the last hour.
-    3) Creates or updates SuspiciousIP entries with reason and details.
+    3) Flags behavioral anomalies (regular timing, path scanning/probing) via detectors.py.
+    4) Creates or updates SuspiciousIP entries with reason and details.
     """
     now = timezone.now()
     one_hour_ago = now - timedelta(hours=1)
@@ -66,10 +74,13 @@ def detect_suspicious_ips(self):
 
     # 2) Sensitive path access detection
     try:
-        # Build OR query for paths
+        # Resolve interned ids via the digest index, then filter on the integer FK
+        sensitive_path_ids = RequestPath.objects.filter(
+            digest__in=[path_digest(p) for p in SENSITIVE_PATHS],
+        ).values("id")
         sensitive_qs = (
             RequestLog.objects
-            .filter(timestamp__gte=one_hour_ago, path__in=SENSITIVE_PATHS)
+            .filter(timestamp__gte=one_hour_ago, path__in=sensitive_path_ids)
             .values("ip_address")
             .annotate(access_count=Count("id"), last_seen=Max("timestamp"))
         )
@@ -98,6 +109,129 @@ def detect_suspicious_ips(self):
     except Exception as exc:
         logger.exception("Error during sensitive-path detection: %s", exc)
 
+    # 3) Behavioral detection (vectorized features over the same window)
+    try:
+        for row in detect_behavioral_anomalies(one_hour_ago, now):
+            ip = row["ip_address"]
+            reason = row["reason"]
+            details = row["details"]
+            last_seen = datetime.fromtimestamp(row["last_seen"], tz=dt_timezone.utc)
+
+            obj, created = SuspiciousIP.objects.update_or_create(
+                ip_address=ip,
+                reason=reason,
+                defaults={
+                    "details": details,
+                    "last_seen": last_seen,
+                    "resolved": False,
+                },
+            )
+            if created:
+                logger.warning("Flagged suspicious IP (%s): %s - %s", reason, ip, details)
+            else:
+                logger.info("Updated suspicious IP (%s): %s - %s", reason, ip, details)
+    except Exception as exc:
+        logger.exception("Error during behavioral detection: %s", exc)
+
     logger.info("Anomaly detection finished at %s", timezone.now().isoformat())
     return {"status": "ok", "time": timezone.now().isoformat()}
 
+
+def _bucket_spans(buckets):
+    """Group sorted hour buckets into [start, end) runs of at most ROLLUP_MAX_SPAN_HOURS consecutive hours."""
+    spans = []
+    for bucket in buckets:
+        if spans and bucket == spans[-1][1] and bucket - spans[-1][0] < timedelta(hours=ROLLUP_MAX_SPAN_HOURS):
+            spans[-1][1] = bucket + timedelta(hours=1)
+        else:
+            spans.append([bucket, bucket + timedelta(hours=1)])
+    return spans
+
+
+def _rollup_span(start, end):
+    window_qs = (
+        RequestLog.objects
+        .filter(timestamp__gte=start, timestamp__lt=end)
+        .annotate(bucket=TruncHour("timestamp"))
+        .order_by()
+    )
+
+    ip_rows = (
+        window_qs
+        .values("bucket", "ip_address")
+        .annotate(requests=Count("id"), last_seen=Max("timestamp"))
+    )
+    IPHourlyRollup.objects.bulk_create(
+        [IPHourlyRollup(**row) for row in ip_rows],
+        batch_size=ROLLUP_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["bucket", "ip_address"],
+        update_fields=["requests", "last_seen"],
+    )
+
+    path_rows = (
+        window_qs
+        .values("bucket", "path")
+        .annotate(requests=Count("id"))
+    )
+    PathHourlyRollup.objects.bulk_create(
+        [PathHourlyRollup(bucket=row["bucket"], path_id=row["path"], requests=row["requests"]) for row in path_rows],
+        batch_size=ROLLUP_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["bucket", "path"],
+        update_fields=["requests"],
+    )
+
+
+@shared_task(bind=True)
+def rollup_request_logs(self, hours=ROLLUP_REFRESH_HOURS):
+    """
+    Celery task that (re)computes hourly rollups from RequestLog:
+
+    1) Collects the hours touched by rows added since the last run (id above the
+       RollupWatermark), whatever their timestamp: late flushes from the middleware's
+       degraded-mode buffer, gaps while beat was down and, on the first run, all history.
+    2) Adds the last `hours` buckets, which also catches rows committed out of id order.
+    3) Recounts requests per (hour, IP) and per (hour, path) in those buckets and upserts
+       absolute counts into IPHourlyRollup / PathHourlyRollup, so reruns are idempotent.
+    4) Advances the watermark once every bucket was written.
+
+    Scheduled every few minutes; the activity API reads these tables instead of scanning RequestLog.
+    `manage.py rollup_requests` runs it by hand (e.g. --hours 168 to recount a week).
+    """
+    now = timezone.now()
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+
+    watermark, _ = RollupWatermark.objects.get_or_create(name=ROLLUP_WATERMARK)
+    # read before counting: rows above high_id are picked up by the next run
+    high_id = RequestLog.objects.aggregate(high=Max("id"))["high"] or 0
+    buckets = set(
+        RequestLog.objects
+        .filter(id__gt=watermark.last_request_id, id__lte=high_id)
+        .annotate(bucket=TruncHour("timestamp"))
+        .order_by()
+        .values_list("bucket", flat=True)
+        .distinct()
+    )
+    buckets.update(current_hour - timedelta(hours=h) for h in range(max(hours, 1)))
+    spans = _bucket_spans(sorted(buckets))
+
+    logger.info(
+        "Request rollup started at %s (%d buckets in %d spans, rows %d..%d)",
+        now.isoformat(), len(buckets), len(spans), watermark.last_request_id + 1, high_id,
+    )
+
+    try:
+        for start, end in spans:
+            _rollup_span(start, end)
+    except Exception as exc:
+        # watermark stays put, so the next run retries the same rows
+        logger.exception("Error during request rollup: %s", exc)
+        return {"status": "error", "time": timezone.now().isoformat()}
+
+    if high_id > watermark.last_request_id:
+        watermark.last_request_id = high_id
+        watermark.save(update_fields=["last_request_id", "updated_at"])
+
+    logger.info("Request rollup finished at %s", timezone.now().isoformat())
+    return {"status": "ok", "buckets": len(buckets), "time": timezone.now().isoformat()}
@@ -1,3 +1,512 @@
-from django.test import TestCase
+import json
+import tempfile
+from collections import deque
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.db import DataError, OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import middleware
+from .breaker import CLOSED, OPEN, CircuitBreaker
+from .detectors import compute_features, flag_features, load_window
+from .management.commands.simulate_thresholds import max_window_counts
+from .models import BlockedIP, IPHourlyRollup, PathHourlyRollup, RequestLog, RollupWatermark, SuspiciousIP
+from .paths import intern_path
+from .tasks import ROLLUP_WATERMARK, rollup_request_logs
+
+
+class IPActivityViewTests(TestCase):
+    ip = "203.0.113.7"
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.login(username="staff", password="pw")
+
+        # five rows sharing one timestamp plus two older ones
+        tied = timezone.now() - timedelta(minutes=5)
+        path_id = intern_path("/tied")
+        RequestLog.objects.bulk_create(
+            [RequestLog(ip_address=self.ip, path_id=path_id, timestamp=tied) for _ in range(5)]
+            + [RequestLog(ip_address=self.ip, path_id=path_id, timestamp=tied - timedelta(minutes=i)) for i in (1, 2)]
+        )
+
+    def _get(self, **params):
+        return self.client.get(reverse("activity-ip-timeline", args=[self.ip]), params)
+
+    def test_cursor_pagination_covers_tied_timestamps_once(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            body = self._get(**params).json()
+            self.assertLessEqual(len(body["results"]), 2)
+            seen.extend(row["id"] for row in body["results"])
+            cursor = body["next_cursor"]
+            if not cursor:
+                break
+
+        expected = list(
+            RequestLog.objects.filter(ip_address=self.ip)
+            .order_by("-timestamp", "-id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursor_is_rejected(self):
+        response = self._get(cursor="not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "invalid cursor")
+
+    def test_requires_staff(self):
+        self.client.logout()
+        response = self._get()
+        self.assertEqual(response.status_code, 302)
+
+
+class RollupRequestLogsTests(TestCase):
+    ips = ["198.51.100.1", "198.51.100.2", "198.51.100.3", "198.51.100.4", "198.51.100.5"]
+
+    def setUp(self):
+        # 300 rows over the five hours before the current one: 12 per IP per hour
+        self.current_hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        self.paths = [intern_path("/a"), intern_path("/b")]
+        RequestLog.objects.bulk_create([
+            RequestLog(
+                ip_address=ip,
+                path_id=self.paths[i % 2],
+                timestamp=self.current_hour - timedelta(hours=h, minutes=5 * i + 1),
+            )
+            for h in range(5)
+            for ip in self.ips
+            for i in range(12)
+        ])
+
+    def _ip_counts(self):
+        return dict(
+            IPHourlyRollup.objects.values("ip_address").annotate(total=Sum("requests")).values_list("ip_address", "total")
+        )
+
+    def test_first_run_backfills_all_history(self):
+        rollup_request_logs()
+
+        self.assertEqual(self._ip_counts(), {ip: 60 for ip in self.ips})
+        # bucket math: each row lands in the hour that contains it
+        self.assertEqual(
+            sorted(IPHourlyRollup.objects.filter(ip_address=self.ips[0]).values_list("bucket", "requests")),
+            [(self.current_hour - timedelta(hours=h), 12) for h in range(5, 0, -1)],
+        )
+        self.assertEqual(
+            dict(PathHourlyRollup.objects.values("path").annotate(total=Sum("requests")).values_list("path", "total")),
+            {self.paths[0]: 150, self.paths[1]: 150},
+        )
+        self.assertEqual(
+            RollupWatermark.objects.get(name=ROLLUP_WATERMARK).last_request_id,
+            RequestLog.objects.order_by("-id").values_list("id", flat=True).first(),
+        )
+
+    def test_rerun_is_idempotent(self):
+        rollup_request_logs()
+        before = list(IPHourlyRollup.objects.order_by("bucket", "ip_address").values_list("bucket", "ip_address", "requests"))
+        rollup_request_logs(hours=24)
+        after = list(IPHourlyRollup.objects.order_by("bucket", "ip_address").values_list("bucket", "ip_address", "requests"))
+        self.assertEqual(before, after)
+        self.assertEqual(PathHourlyRollup.objects.count(), 10)
+
+    def test_late_rows_recount_their_old_bucket(self):
+        rollup_request_logs()
+        # e.g. flushed from the degraded-mode buffer long after the request
+        late = self.current_hour - timedelta(hours=30, minutes=10)
+        RequestLog.objects.create(ip_address=self.ips[0], path_id=self.paths[0], timestamp=late)
+        RequestLog.objects.create(ip_address=self.ips[1], path_id=self.paths[0], timestamp=self.current_hour - timedelta(hours=4, minutes=1))
+
+        rollup_request_logs()
+
+        self.assertEqual(
+            IPHourlyRollup.objects.get(ip_address=self.ips[0], bucket=late.replace(minute=0)).requests, 1,
+        )
+        self.assertEqual(self._ip_counts()[self.ips[1]], 61)
+
+    def test_command_full_rebuild(self):
+        rollup_request_logs()
+        IPHourlyRollup.objects.all().delete()
+        out = StringIO()
+        call_command("rollup_requests", "--full", stdout=out)
+        self.assertEqual(self._ip_counts(), {ip: 60 for ip in self.ips})
+        self.assertIn("Recounted", out.getvalue())
+
+
+class ActivitySummaryViewTests(TestCase):
+    ip = "203.0.113.9"
+    other_ip = "203.0.113.10"
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.login(username="staff", password="pw")
+
+        self.previous_hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        home, login = intern_path("/home"), intern_path("/login")
+        RequestLog.objects.bulk_create(
+            [RequestLog(ip_address=self.ip, path_id=home, timestamp=self.previous_hour + timedelta(minutes=i)) for i in range(3)]
+            + [RequestLog(ip_address=self.ip, path_id=login, timestamp=self.previous_hour - timedelta(hours=2))]
+            + [RequestLog(ip_address=self.other_ip, path_id=login, timestamp=self.previous_hour)]
+            # outside a 6-hour window
+            + [RequestLog(ip_address=self.other_ip, path_id=login, timestamp=self.previous_hour - timedelta(hours=10)) for _ in range(9)]
+        )
+        rollup_request_logs()
+
+    def test_top_ips(self):
+        body = self.client.get(reverse("activity-top-ips"), {"hours": 6}).json()
+        self.assertEqual(
+            body["results"],
+            [{"ip_address": self.ip, "requests": 4}, {"ip_address": self.other_ip, "requests": 1}],
+        )
+        body = self.client.get(reverse("activity-top-ips"), {"hours": 24, "limit": 1}).json()
+        self.assertEqual(body["results"], [{"ip_address": self.other_ip, "requests": 10}])
+
+    def test_top_paths_resolves_path_strings(self):
+        body = self.client.get(reverse("activity-top-paths"), {"hours": 6}).json()
+        self.assertEqual(body["results"], [{"path": "/home", "requests": 3}, {"path": "/login", "requests": 2}])
+
+    def test_ip_status(self):
+        BlockedIP.objects.create(ip_address=self.ip, reason="manual")
+        SuspiciousIP.objects.create(ip_address=self.ip, reason="high_request_rate")
+        SuspiciousIP.objects.create(ip_address=self.ip, reason="path_scanning", resolved=True)
+
+        body = self.client.get(reverse("activity-ip-status", args=[self.ip]), {"hours": 6}).json()
+        self.assertEqual(body["blocked"]["reason"], "manual")
+        self.assertEqual([row["reason"] for row in body["suspicious"]], ["high_request_rate"])
+        self.assertEqual(body["total_requests"], 4)
+        self.assertEqual([row["requests"] for row in body["hourly"]], [1, 3])
+
+    def test_bad_params_are_rejected(self):
+        for name in ("activity-top-ips", "activity-top-paths"):
+            response = self.client.get(reverse(name), {"hours": "x"})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["detail"], "hours must be an integer")
+        response = self.client.get(reverse("activity-ip-status", args=[self.ip]), {"hours": 0})
+        self.assertEqual(response.status_code, 400)
+
+
+class ComputeFeaturesTests(SimpleTestCase):
+    # rows deliberately out of time order:
+    #   ip 0 at t=0,10,20,30 on paths 0,0,1,1 (path 0 is its own)
+    #   ip 1 at t=5,25 on paths 1,2 (path 2 is its own)
+    ip_codes = [0, 1, 0, 0, 1, 0]
+    timestamps = [30.0, 25.0, 0.0, 10.0, 5.0, 20.0]
+    path_codes = [1, 2, 0, 0, 1, 1]
+
+    def test_hand_computed_features(self):
+        f = compute_features(self.ip_codes, self.timestamps, self.path_codes, n_ips=2, n_paths=3)
+
+        np.testing.assert_array_equal(f["requests"], [4, 2])
+        np.testing.assert_array_equal(f["last_seen"], [30.0, 25.0])
+        np.testing.assert_allclose(f["interarrival_cv"], [0.0, 0.0])
+        np.testing.assert_allclose(f["burstiness"], [-1.0, -1.0])
+        np.testing.assert_array_equal(f["distinct_paths"], [2, 2])
+        np.testing.assert_allclose(f["distinct_ratio"], [0.5, 1.0])
+        np.testing.assert_allclose(f["path_entropy"], [1.0, 1.0])
+        np.testing.assert_array_equal(f["rare_paths"], [1, 1])
+        np.testing.assert_allclose(f["rare_ratio"], [0.5, 0.5])
+
+    def test_irregular_gaps(self):
+        # gaps 10 and 30: mean 20, std 10
+        f = compute_features([0, 0, 0], [0.0, 10.0, 40.0], [0, 0, 0], n_ips=1, n_paths=1)
+        np.testing.assert_allclose(f["interarrival_cv"], [0.5])
+        np.testing.assert_allclose(f["burstiness"], [-1.0 / 3.0])
+
+    def test_ignored_paths_only_affect_path_features(self):
+        f = compute_features(
+            self.ip_codes, self.timestamps, self.path_codes, n_ips=2, n_paths=3,
+            ignored_paths=np.array([False, False, True]),
+        )
+
+        np.testing.assert_array_equal(f["requests"], [4, 2])
+        np.testing.assert_array_equal(f["distinct_paths"], [2, 1])
+        np.testing.assert_allclose(f["path_entropy"], [1.0, 0.0])
+        np.testing.assert_array_equal(f["rare_paths"], [1, 0])
+
+    def test_ordinary_browsing_is_not_scanning(self):
+        # one client loading 40 distinct pages, one request each, spread over an hour
+        rng = np.random.default_rng(0)
+        f = compute_features(
+            np.zeros(40, dtype=int), rng.uniform(0, 3600, 40), np.arange(40), n_ips=1, n_paths=40,
+        )
+        self.assertFalse(flag_features(f)["path_scanning"][0])
+
+
+class LoadWindowTests(TestCase):
+    def test_streams_epoch_seconds_and_path_ids_inside_window(self):
+        base = timezone.now().replace(microsecond=250000) - timedelta(minutes=30)
+        home, admin = intern_path("/home"), intern_path("/admin")
+        RequestLog.objects.bulk_create([
+            RequestLog(ip_address="198.51.100.1", path_id=home, timestamp=base),
+            RequestLog(ip_address="198.51.100.2", path_id=admin, timestamp=base + timedelta(seconds=90)),
+            RequestLog(ip_address="198.51.100.1", path_id=admin, timestamp=base + timedelta(seconds=30)),
+            RequestLog(ip_address="198.51.100.9", path_id=home, timestamp=base - timedelta(hours=2)),
+        ])
+
+        ip_labels, ip_codes, timestamps, path_labels, path_codes = load_window(base - timedelta(minutes=1))
+
+        rows = sorted(zip(ip_labels[ip_codes], timestamps, path_labels[path_codes]), key=lambda r: r[1])
+        self.assertEqual([(ip, path) for ip, _, path in rows], [
+            ("198.51.100.1", home), ("198.51.100.1", admin), ("198.51.100.2", admin),
+        ])
+        np.testing.assert_allclose(
+            [ts for _, ts, _ in rows],
+            [base.timestamp(), base.timestamp() + 30, base.timestamp() + 90],
+            atol=1e-3,
+        )
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_count_slow_false_ignores_latency(self):
+        breaker = CircuitBreaker("test", window_size=2, min_calls=2, slow_call_seconds=0)
+        for _ in range(5):
+            breaker.call(lambda: None, fallback=lambda: None, count_slow=False)
+        self.assertEqual(breaker.state, CLOSED)
+
+        for _ in range(2):
+            breaker.call(lambda: None, fallback=lambda: None)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_probe_killed_by_base_exception_releases_half_open(self):
+        class WorkerTimeout(BaseException):
+            pass
+
+        def hang():
+            raise WorkerTimeout()
+
+        breaker = CircuitBreaker("test", min_calls=1, open_seconds=0)
+        breaker.call(lambda: 1 / 0, fallback=lambda: None)
+        self.assertEqual(breaker.state, OPEN)
+
+        with self.assertRaises(WorkerTimeout):
+            breaker.call(hang, fallback=lambda: None)
+        self.assertEqual(breaker.state, OPEN)
+        # the next probe is let through instead of short-circuiting forever
+        self.assertEqual(breaker.call(lambda: "ok", fallback=lambda: "fallback"), "ok")
+        self.assertEqual(breaker.state, CLOSED)
+
+
+class MiddlewareDegradedModeTests(TestCase):
+    blocked_ip = "192.0.2.66"
+    client_ip = "192.0.2.10"
+
+    def setUp(self):
+        BlockedIP.objects.create(ip_address=self.blocked_ip)
+        self.breaker = CircuitBreaker("test", min_calls=4, open_seconds=60)
+        for target, value in [
+            ("ip_tracking.middleware.db_breaker", self.breaker),
+            ("ip_tracking.middleware._log_buffer", deque(maxlen=middleware.LOG_BUFFER_SIZE)),
+            ("ip_tracking.middleware._log_buffer_dropped", 0),
+            ("ip_tracking.middleware._log_rows_rejected", 0),
+            ("ip_tracking.middleware._blocklist_snapshot", frozenset()),
+            ("ip_tracking.middleware._blocklist_loaded_at", None),
+        ]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.mw = middleware.IPLoggingMiddleware(lambda request: HttpResponse("ok"))
+        self.factory = RequestFactory()
+
+    def _hit(self, ip):
+        return self.mw(self.factory.get("/page", REMOTE_ADDR=ip)).status_code
+
+    def test_trip_fallback_and_recovery(self):
+        self.assertEqual(self._hit(self.blocked_ip), 403)  # loads the snapshot
+        self.assertEqual(self._hit(self.client_ip), 200)
+        logged = RequestLog.objects.count()
+
+        with mock.patch("django.db.models.query.QuerySet.exists", side_effect=OperationalError("db down")), \
+                mock.patch("django.db.models.query.QuerySet.create", side_effect=OperationalError("db down")):
+            for _ in range(3):
+                self.assertEqual(self._hit(self.client_ip), 200)
+            self.assertEqual(self.breaker.state, OPEN)
+
+            # open: blocklist served from the snapshot, logs buffered
+            self.assertEqual(self._hit(self.blocked_ip), 403)
+            self.assertEqual(self._hit(self.client_ip), 200)
+        buffered = len(middleware._log_buffer)
+        self.assertEqual(buffered, 4)
+        self.assertEqual(RequestLog.objects.count(), logged)
+
+        # half-open probe succeeds -> closed, buffer flushed
+        self.breaker.open_seconds = 0
+        self.assertEqual(self._hit(self.client_ip), 200)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(len(middleware._log_buffer), 0)
+        self.assertEqual(RequestLog.objects.count(), logged + buffered + 1)
+        self.assertEqual(
+            self.breaker.metrics()["transitions"],
+            {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1},
+        )
+
+    def test_fresh_snapshot_skips_point_lookup(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.mw._is_blocked(self.blocked_ip))
+        with self.assertNumQueries(1):
+            self.assertFalse(self.mw._is_blocked(self.client_ip))
+
+    def test_failed_flush_counts_overflow(self):
+        buffer = deque([("192.0.2.1", "/a", timezone.now(), 0)] * 3, maxlen=3)
+        now = timezone.now()
+
+        def concurrent_requests_then_fail(paths):
+            # two requests buffer their rows while the flush is in flight
+            buffer.extend([(self.client_ip, "/b", now, 0)] * 2)
+            raise OperationalError("db down")
+
+        with mock.patch("ip_tracking.middleware._log_buffer", buffer), \
+                mock.patch("ip_tracking.middleware.intern_paths", side_effect=concurrent_requests_then_fail):
+            self.mw._flush_log_buffer()
+            self.assertEqual(len(buffer), 3)
+            self.assertEqual(middleware.degraded_mode_metrics()["log_buffer_dropped"], 2)
+            self.assertEqual([entry[3] for entry in buffer], [1, 1, 1])
+
+    def test_rejected_row_is_dropped_not_buffered(self):
+        with mock.patch("django.db.models.query.QuerySet.create", side_effect=DataError("value too long")):
+            self.assertEqual(self._hit(self.client_ip), 200)
+        self.assertEqual(len(middleware._log_buffer), 0)
+        self.assertEqual(middleware.degraded_mode_metrics()["log_rows_rejected"], 1)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_poison_row_does_not_block_flush(self):
+        now = timezone.now()
+        bad_ip = "x" * 50
+        buffer = deque(
+            [(self.client_ip, "/a", now, 0), (bad_ip, "/a", now, 0), (self.client_ip, "/b", now, 0)],
+            maxlen=middleware.LOG_BUFFER_SIZE,
+        )
+        save = RequestLog.save
+
+        def strict_save(obj, *args, **kwargs):
+            if len(obj.ip_address) > 45:
+                raise DataError("value too long for type character varying(45)")
+            return save(obj, *args, **kwargs)
+
+        with mock.patch("ip_tracking.middleware._log_buffer", buffer), \
+                mock.patch("django.db.models.query.QuerySet.bulk_create", side_effect=DataError("value too long")), \
+                mock.patch.object(RequestLog, "save", strict_save):
+            self.mw._flush_log_buffer()
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(RequestLog.objects.filter(ip_address=self.client_ip).count(), 2)
+        self.assertEqual(middleware.degraded_mode_metrics()["log_rows_rejected"], 1)
+
+    def test_transient_failures_give_up_after_max_attempts(self):
+        now = timezone.now()
+        buffer = deque(
+            [(self.client_ip, "/a", now, middleware.LOG_FLUSH_MAX_ATTEMPTS - 1), (self.client_ip, "/b", now, 0)],
+            maxlen=middleware.LOG_BUFFER_SIZE,
+        )
+        with mock.patch("ip_tracking.middleware._log_buffer", buffer), \
+                mock.patch("ip_tracking.middleware.intern_paths", side_effect=OperationalError("db down")):
+            self.mw._flush_log_buffer()
+        self.assertEqual([entry[1:] for entry in buffer], [("/b", now, 1)])
+        self.assertEqual(middleware.degraded_mode_metrics()["log_buffer_dropped"], 1)
+
+    def test_single_snapshot_reload_at_a_time(self):
+        # another request holds the reload lock: keep the old snapshot, no table load
+        self.assertTrue(middleware._blocklist_refresh_lock.acquire(blocking=False))
+        try:
+            with self.assertNumQueries(0):
+                self.assertFalse(self.mw._refresh_blocklist_snapshot())
+        finally:
+            middleware._blocklist_refresh_lock.release()
+        self.assertTrue(self.mw._refresh_blocklist_snapshot())
+        self.assertIn(self.blocked_ip, middleware._blocklist_snapshot)
+
+class InternPathsMigrationTests(TransactionTestCase):
+    before = [("ip_tracking", "0006_requestlog_timestamp_default")]
+    after = [("ip_tracking", "0009_requestlog_path_fk")]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self._migrate(executor.loader.graph.leaf_nodes())
+
+    def test_round_trip(self):
+        apps = self._migrate(self.before)
+        OldLog = apps.get_model("ip_tracking", "RequestLog")
+        OldRollup = apps.get_model("ip_tracking", "PathHourlyRollup")
+        now = timezone.now()
+        OldLog.objects.bulk_create([
+            OldLog(ip_address="192.0.2.1", path="/a"),
+            OldLog(ip_address="192.0.2.2", path="/a"),
+            OldLog(ip_address="192.0.2.1", path="/b"),
+        ])
+        OldRollup.objects.create(bucket=now, path="/b", requests=1)
+
+        apps = self._migrate(self.after)
+        RequestPath = apps.get_model("ip_tracking", "RequestPath")
+        NewLog = apps.get_model("ip_tracking", "RequestLog")
+        NewRollup = apps.get_model("ip_tracking", "PathHourlyRollup")
+        self.assertEqual(sorted(RequestPath.objects.values_list("path", flat=True)), ["/a", "/b"])
+        self.assertEqual(
+            sorted(NewLog.objects.values_list("ip_address", "path__path")),
+            [("192.0.2.1", "/a"), ("192.0.2.1", "/b"), ("192.0.2.2", "/a")],
+        )
+        self.assertEqual(list(NewRollup.objects.values_list("path__path", flat=True)), ["/b"])
+
+        apps = self._migrate(self.before)
+        OldLog = apps.get_model("ip_tracking", "RequestLog")
+        OldRollup = apps.get_model("ip_tracking", "PathHourlyRollup")
+        self.assertEqual(
+            sorted(OldLog.objects.values_list("ip_address", "path")),
+            [("192.0.2.1", "/a"), ("192.0.2.1", "/b"), ("192.0.2.2", "/a")],
+        )
+        self.assertEqual(list(OldRollup.objects.values_list("path", flat=True)), ["/b"])
+
+
+class SimulateThresholdsTests(SimpleTestCase):
+    def test_max_window_counts(self):
+        ip_codes = np.array([0, 0, 0, 1])
+        timestamps = np.array([0.0, 10.0, 3700.0, 5.0])
+
+        np.testing.assert_array_equal(max_window_counts(ip_codes, timestamps, 2, 3600), [2, 1])
+        np.testing.assert_array_equal(max_window_counts(ip_codes, timestamps, 2, 5), [1, 1])
+
+    def test_flagged_and_overlap_counts(self):
+        base = 3600 * 1000  # hour-aligned
+        rows = (
+            [("198.51.100.1", base + i * 10, "/home") for i in range(150)]   # >100 in one hour
+            + [("198.51.100.2", base + i * 20, "/home") for i in range(60)]  # >50 only
+            + [("198.51.100.3", base + 5, "/admin")]                         # production sensitive path
+        )
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as trace:
+            for ip, ts, path in rows:
+                trace.write(json.dumps({"ip_address": ip, "timestamp": ts, "path": path}) + "\n")
+            trace.flush()
+            out = StringIO()
+            call_command(
+                "simulate_thresholds", "--trace", trace.name, "--thresholds", "50", "--windows", "1h",
+                "--path-rules", "none=", "--json", stdout=out,
+            )
+        report = json.loads(out.getvalue())
+
+        policies = [(p["threshold"], p["window_seconds"], p["path_rules"]) for p in report["policies"]]
+        # the production policy is appended even though 100 is not in --thresholds
+        self.assertEqual(policies, [(50, 3600, "production"), (50, 3600, "none"), (100, 3600, "production")])
+        self.assertEqual(report["baseline"], 2)
+        self.assertEqual([p["flagged"] for p in report["policies"]], [3, 2, 2])
+        self.assertEqual([p["shared_with_baseline"] for p in report["policies"]], [2, 1, 2])
+        self.assertEqual(report["pairwise_overlap"], [[3, 2, 2], [2, 2, 1], [2, 1, 2]])
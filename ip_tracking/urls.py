@@ -1,9 +1,23 @@
 # ip_tracking/urls.py
 from django.urls import path
-from .views import login_view, sensitive_authenticated_view
+from .views import (
+    breaker_metrics_view,
+    ip_activity_view,
+    ip_status_view,
+    login_view,
+    sensitive_authenticated_view,
+    top_ips_view,
+    top_paths_view,
+)
 
 urlpatterns = [
     path("login/", login_view, name="login"),
     path("sensitive-auth/", sensitive_authenticated_view, name="sensitive-auth"),
+    # incident-response activity API
+    path("activity/ips/top/", top_ips_view, name="activity-top-ips"),
+    path("activity/paths/top/", top_paths_view, name="activity-top-paths"),
+    path("activity/ips/<str:ip>/", ip_activity_view, name="activity-ip-timeline"),
+    path("activity/ips/<str:ip>/status/", ip_status_view, name="activity-ip-status"),
+    path("health/db-breaker/", breaker_metrics_view, name="health-db-breaker"),
 ]
 
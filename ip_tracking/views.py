@@ -1,9 +1,28 @@
+import base64
+from datetime import datetime, timedelta
+
 from django.shortcuts import render
 from django.http import JsonResponse, HttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from ratelimit.decorators import ratelimit
-from ratelimit.exceptions import Ratelimited
-from django.views.decorators.http import require_POST
+from django.db.models import Q, Sum
+from django.utils import timezone
+from django_ratelimit.decorators import ratelimit
+from django_ratelimit.exceptions import Ratelimited
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_GET, require_POST
+
+from .middleware import degraded_mode_metrics
+from .models import BlockedIP, IPHourlyRollup, PathHourlyRollup, RequestLog, RequestPath, SuspiciousIP
+
+# activity API tuning
+ACTIVITY_CACHE_TTL = 15            # seconds; responses are cached per full URL
+ACTIVITY_DEFAULT_WINDOW_HOURS = 24
+ACTIVITY_MAX_WINDOW_HOURS = 24 * 7
+TIMELINE_DEFAULT_LIMIT = 100
+TIMELINE_MAX_LIMIT = 500
+TOP_DEFAULT_LIMIT = 20
+TOP_MAX_LIMIT = 100
 
 # --- Login view (anonymous users) ---
 @require_POST
@@ -37,3 +56,195 @@ def sensitive_authenticated_view(request):
 #         return JsonResponse({"detail": "Too many requests"}, status=429)
 #     ...
 
+
+# --- Incident-response activity API (staff only, read-only JSON) ---
+# Timelines are keyset-paginated over the (ip_address, timestamp, id) index on RequestLog;
+# top-N and per-IP summaries read the hourly rollup tables maintained by
+# tasks.rollup_request_logs, so none of these endpoints scans RequestLog.
+
+
+class _BadParam(ValueError):
+    pass
+
+
+def _int_param(request, name, default, maximum):
+    raw = request.GET.get(name)
+    if raw in (None, ""):
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise _BadParam(f"{name} must be an integer")
+    if value < 1:
+        raise _BadParam(f"{name} must be positive")
+    return min(value, maximum)
+
+
+def _window_start(hours):
+    """Start of the hour-aligned window covering the current hour and the `hours - 1` before it."""
+    current_hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+    return current_hour - timedelta(hours=hours - 1)
+
+
+def _encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts_raw, pk_raw = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        return datetime.fromisoformat(ts_raw), int(pk_raw)
+    except Exception:
+        raise _BadParam("invalid cursor")
+
+
+def _bad_request(exc):
+    return JsonResponse({"detail": str(exc)}, status=400)
+
+
+@require_GET
+@staff_member_required
+@cache_page(ACTIVITY_CACHE_TTL)
+def ip_activity_view(request, ip):
+    """
+    Newest-first request timeline for one IP.
+
+    Query params:
+    - hours: look-back window (default 24, max 168)
+    - limit: page size (default 100, max 500)
+    - cursor: opaque `next_cursor` from the previous page
+    """
+    try:
+        hours = _int_param(request, "hours", ACTIVITY_DEFAULT_WINDOW_HOURS, ACTIVITY_MAX_WINDOW_HOURS)
+        limit = _int_param(request, "limit", TIMELINE_DEFAULT_LIMIT, TIMELINE_MAX_LIMIT)
+        cursor = request.GET.get("cursor")
+        after = _decode_cursor(cursor) if cursor else None
+    except _BadParam as exc:
+        return _bad_request(exc)
+
+    since = timezone.now() - timedelta(hours=hours)
+    qs = RequestLog.objects.filter(ip_address=ip, timestamp__gte=since)
+    if after:
+        ts, pk = after
+        qs = qs.filter(Q(timestamp__lt=ts) | Q(timestamp=ts, id__lt=pk))
+
+    # fetch one extra row to know whether another page exists
+    rows = list(
+        qs.order_by("-timestamp", "-id")
+        .values("id", "timestamp", "path__path", "country", "city")[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = _encode_cursor(rows[-1]["timestamp"], rows[-1]["id"]) if has_more else None
+    for row in rows:
+        row["timestamp"] = row["timestamp"].isoformat()
+        row["path"] = row.pop("path__path")
+
+    return JsonResponse({
+        "ip_address": ip,
+        "since": since.isoformat(),
+        "results": rows,
+        "next_cursor": next_cursor,
+    })
+
+
+@require_GET
+@staff_member_required
+@cache_page(ACTIVITY_CACHE_TTL)
+def top_ips_view(request):
+    """
+    IPs with the most requests over the last `hours` hourly buckets (from IPHourlyRollup).
+    """
+    try:
+        hours = _int_param(request, "hours", ACTIVITY_DEFAULT_WINDOW_HOURS, ACTIVITY_MAX_WINDOW_HOURS)
+        limit = _int_param(request, "limit", TOP_DEFAULT_LIMIT, TOP_MAX_LIMIT)
+    except _BadParam as exc:
+        return _bad_request(exc)
+
+    since = _window_start(hours)
+    rows = (
+        IPHourlyRollup.objects
+        .filter(bucket__gte=since)
+        .values("ip_address")
+        .annotate(requests=Sum("requests"))
+        .order_by("-requests", "ip_address")[:limit]
+    )
+    return JsonResponse({"since": since.isoformat(), "results": list(rows)})
+
+
+@require_GET
+@staff_member_required
+@cache_page(ACTIVITY_CACHE_TTL)
+def top_paths_view(request):
+    """
+    Most requested paths over the last `hours` hourly buckets (from PathHourlyRollup).
+    """
+    try:
+        hours = _int_param(request, "hours", ACTIVITY_DEFAULT_WINDOW_HOURS, ACTIVITY_MAX_WINDOW_HOURS)
+        limit = _int_param(request, "limit", TOP_DEFAULT_LIMIT, TOP_MAX_LIMIT)
+    except _BadParam as exc:
+        return _bad_request(exc)
+
+    since = _window_start(hours)
+    # group on the integer path id, then resolve strings for the top rows only
+    rows = list(
+        PathHourlyRollup.objects
+        .filter(bucket__gte=since)
+        .values("path")
+        .annotate(requests=Sum("requests"))
+        .order_by("-requests", "path")[:limit]
+    )
+    labels = RequestPath.objects.in_bulk([row["path"] for row in rows])
+    for row in rows:
+        row["path"] = labels[row["path"]].path
+    return JsonResponse({"since": since.isoformat(), "results": rows})
+
+
+@require_GET
+@staff_member_required
+@cache_page(ACTIVITY_CACHE_TTL)
+def ip_status_view(request, ip):
+    """
+    Current BlockedIP / SuspiciousIP status for one IP plus its hourly request counts.
+    """
+    try:
+        hours = _int_param(request, "hours", ACTIVITY_DEFAULT_WINDOW_HOURS, ACTIVITY_MAX_WINDOW_HOURS)
+    except _BadParam as exc:
+        return _bad_request(exc)
+
+    blocked = BlockedIP.objects.filter(ip_address=ip).values("reason", "created_at").first()
+    suspicious = list(
+        SuspiciousIP.objects
+        .filter(ip_address=ip, resolved=False)
+        .values("reason", "details", "detected_at", "last_seen")
+    )
+
+    since = _window_start(hours)
+    hourly = list(
+        IPHourlyRollup.objects
+        .filter(ip_address=ip, bucket__gte=since)
+        .order_by("bucket")
+        .values("bucket", "requests")
+    )
+
+    return JsonResponse({
+        "ip_address": ip,
+        "blocked": blocked,
+        "suspicious": suspicious,
+        "since": since.isoformat(),
+        "total_requests": sum(row["requests"] for row in hourly),
+        "hourly": hourly,
+    })
+
+
+@require_GET
+@staff_member_required
+def breaker_metrics_view(request):
+    """
+    State, transition counts and fallback-buffer sizes of the middleware's DB circuit breaker
+    (per worker process; not cached).
+    """
+    return JsonResponse(degraded_mode_metrics())